@@ -1,11 +1,17 @@
 """
 Scanner AI Package
 """
-from .scanner_agent import ScannerAgent
-from .repository_manager import RepositoryManager
-from .vulnerability_scanner import VulnerabilityScanner
-from .drupal_checker import DrupalModuleChecker
-from .ai_analyzer import AIAnalyzer
+import importlib
+
+# Classes are imported on first access so that heavy dependencies
+# (openai, anthropic, requests, ...) only load when actually used
+_lazy_imports = {
+    'ScannerAgent': 'scanner_agent',
+    'RepositoryManager': 'repository_manager',
+    'VulnerabilityScanner': 'vulnerability_scanner',
+    'DrupalModuleChecker': 'drupal_checker',
+    'AIAnalyzer': 'ai_analyzer'
+}
 
 __all__ = [
     'ScannerAgent',
@@ -14,3 +20,14 @@ __all__ = [
     'DrupalModuleChecker',
     'AIAnalyzer'
 ]
+
+
+def __getattr__(name):
+    if name in _lazy_imports:
+        module = importlib.import_module(f'.{_lazy_imports[name]}', __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
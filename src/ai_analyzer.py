@@ -2,21 +2,97 @@
 AI-Powered Report Analyzer
 Uses AI to analyze scan results and provide insights
 """
+import asyncio
+import json
 import logging
 import os
-from typing import Dict, Any, Optional
+from collections import Counter, defaultdict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
 
 logger = logging.getLogger(__name__)
 
 
+def count_findings(scan_results: Dict[str, Any]) -> int:
+    """Count the findings of a scan result worth an AI analysis"""
+    vuln_results = scan_results.get('vulnerability_scan') or {}
+    drupal_results = scan_results.get('drupal_check') or {}
+    # "Note:" common issues are informational (e.g. the clone's own .git directory)
+    common_issues = [issue for issue in vuln_results.get('common_issues', [])
+                     if not issue.startswith('Note:')]
+    return (len(vuln_results.get('python_dependencies', []))
+            + len(vuln_results.get('bandit_issues', []))
+            + len(common_issues)
+            + len(drupal_results.get('outdated_modules', [])))
+
+_PROMPT_HEADER = (
+    "Analyze the following security scan results and provide:\n"
+    "1. Summary of critical issues\n"
+    "2. Prioritized recommendations\n"
+    "3. Risk assessment\n\n"
+    "Scan Results:\n"
+)
+_PROMPT_FOOTER = "\nProvide a concise security analysis and recommendations."
+_SYSTEM_PROMPT = "You are a security analyst expert. Provide concise, actionable security recommendations."
+
+# Coalesced prompts carry several repositories and ask for one analysis each
+_BATCH_PROMPT_HEADER = (
+    "Analyze each of the following {count} security scan results separately. For each one provide:\n"
+    "1. Summary of critical issues\n"
+    "2. Prioritized recommendations\n"
+    "3. Risk assessment\n\n"
+)
+_BATCH_PROMPT_FOOTER = (
+    "\nRespond with only a JSON array of {count} strings, one concise security "
+    "analysis per scan result, in the order given."
+)
+_MAX_TOKENS_PER_ANALYSIS = 1000
+
+# Token-efficient prompts: terse instructions and a small response budget,
+# for quantized local models with short context windows
+TOKEN_EFFICIENT_MAX_TOKENS = 300
+_COMPACT_PROMPT_HEADER = "Security scan results:\n"
+_COMPACT_PROMPT_FOOTER = "\nList the critical issues and top fixes in a few short bullets."
+_COMPACT_BATCH_PROMPT_HEADER = (
+    "For each of these {count} security scan results, list the critical issues "
+    "and top fixes in a few short bullets.\n\n"
+)
+_COMPACT_SYSTEM_PROMPT = "You are a security analyst. Be brief."
+
+
 class AIAnalyzer:
     """Uses AI to analyze security scan results"""
     
-    def __init__(self, provider: str = 'openai', model: str = None, base_url: str = None):
+    def __init__(self, provider: str = 'openai', model: str = None, base_url: str = None,
+                 async_mode: bool = False, quantization_hint: str = None,
+                 token_efficient_prompt: bool = False):
         self.provider = provider
         self.model = model or os.getenv('OPENAI_MODEL', 'gpt-4')
         self.base_url = base_url or os.getenv('OPENAI_BASE_URL')
+        self.async_mode = async_mode
+        self.quantization_hint = quantization_hint
+        # Quantized local models get the short prompt unless told otherwise
+        self.token_efficient_prompt = token_efficient_prompt or bool(quantization_hint)
+        if self.token_efficient_prompt:
+            self.analysis_max_tokens = TOKEN_EFFICIENT_MAX_TOKENS
+            self._system_prompt = _COMPACT_SYSTEM_PROMPT
+            self._prompt_header, self._prompt_footer = _COMPACT_PROMPT_HEADER, _COMPACT_PROMPT_FOOTER
+            self._batch_prompt_header = _COMPACT_BATCH_PROMPT_HEADER
+        else:
+            self.analysis_max_tokens = _MAX_TOKENS_PER_ANALYSIS
+            self._system_prompt = _SYSTEM_PROMPT
+            self._prompt_header, self._prompt_footer = _PROMPT_HEADER, _PROMPT_FOOTER
+            self._batch_prompt_header = _BATCH_PROMPT_HEADER
+        self.concurrency = int(os.getenv('AI_CONCURRENCY', '20'))
+        if self.concurrency < 1:
+            raise ValueError(f"AI_CONCURRENCY must be at least 1, got {self.concurrency}")
+        # claude-3-sonnet and many OpenAI-compatible models cap a response at 4096 tokens
+        self.max_output_tokens = int(os.getenv('AI_MAX_OUTPUT_TOKENS', '4096'))
+        # A group's analyses must fit in one response
+        self.batch_size = max(1, min(int(os.getenv('AI_BATCH_SIZE', '4')),
+                                     self.max_output_tokens // self.analysis_max_tokens))
         self.client = None
+        self.async_client = None
         self._initialize_client()
     
     def _initialize_client(self):
@@ -36,6 +112,8 @@ class AIAnalyzer:
                         )
                         logger.info(f"OpenAI client initialized with local endpoint: {self.base_url}")
                         logger.info(f"Using model: {self.model}")
+                        if self.quantization_hint:
+                            logger.info(f"Model quantization: {self.quantization_hint}")
                     else:
                         self.client = openai.OpenAI(api_key=api_key)
                         logger.info("OpenAI client initialized with cloud endpoint")
@@ -56,6 +134,58 @@ class AIAnalyzer:
         except Exception as e:
             logger.error(f"Failed to initialize AI client: {e}")
     
+    def _create_async_client(self, http_client):
+        """Create an async provider client for the running event loop
+        
+        Pooled connections belong to the loop that opened them, so each
+        asyncio.run() needs its own client.
+        """
+        if self.provider == 'openai':
+            import openai
+            return openai.AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY', 'not-needed'),
+                base_url=self.base_url,
+                http_client=http_client
+            )
+        elif self.provider == 'anthropic':
+            import anthropic
+            return anthropic.AsyncAnthropic(
+                api_key=os.getenv('ANTHROPIC_API_KEY'),
+                http_client=http_client
+            )
+        return None
+    
+    @asynccontextmanager
+    async def _async_session(self):
+        """Provide self.async_client for the duration of a batch"""
+        if self.async_client is not None:
+            # Reuse the client of an enclosing session
+            yield self.async_client
+            return
+        http_client = self._create_async_http_client()
+        self.async_client = self._create_async_client(http_client)
+        try:
+            yield self.async_client
+        finally:
+            # Close pooled connections on the loop that opened them
+            client, self.async_client = self.async_client, None
+            try:
+                if client is not None:
+                    await client.close()
+            finally:
+                await http_client.aclose()
+    
+    def _create_async_http_client(self):
+        """Create a pooled HTTP client shared by all concurrent AI requests"""
+        import httpx
+        
+        # Keep one warm connection per allowed in-flight request so batched
+        # calls reuse TCP/TLS sessions instead of reconnecting
+        return httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency
+        ))
+    
     def analyze_scan_results(self, scan_results: Dict[str, Any]) -> Optional[str]:
         """Analyze scan results using AI and provide insights"""
         if not self.client:
@@ -76,59 +206,162 @@ class AIAnalyzer:
             logger.error(f"Error during AI analysis: {e}")
             return None
     
+    async def analyze_scan_results_batch(self, results_list: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Analyze several scan results concurrently, preserving input order"""
+        if not (self.async_mode and self.client):
+            logger.warning("Async AI client not available, skipping batch analysis")
+            return [None] * len(results_list)
+        
+        async with self._async_session():
+            return await self._analyze_groups(results_list)
+    
+    async def _analyze_groups(self, results_list: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Analyze scan results in coalesced groups, preserving input order"""
+        # Results with similar amounts of findings share a coalesced prompt
+        order = sorted(range(len(results_list)), key=lambda i: count_findings(results_list[i]))
+        groups = [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+        # Shared by every request, including per-result fallbacks, so no more
+        # than AI_CONCURRENCY requests are ever in flight
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def analyze(group: List[int]) -> List[Optional[str]]:
+            return await self._analyze_coalesced([results_list[i] for i in group], semaphore)
+        
+        logger.info(f"Requesting AI analysis for {len(results_list)} scan results in "
+                    f"{len(groups)} requests (concurrency: {self.concurrency})")
+        analyses = [None] * len(results_list)
+        for group, group_analyses in zip(groups, await asyncio.gather(*[analyze(g) for g in groups])):
+            for i, analysis in zip(group, group_analyses):
+                analyses[i] = analysis
+        return analyses
+    
+    async def analyze_batch(self, results: List[Dict[str, Any]],
+                            semaphore: Optional[asyncio.Semaphore] = None) -> List[Optional[str]]:
+        """Analyze several scan results with a single request, one analysis per result
+        
+        Falls back to one request per result if the response cannot be split
+        back into per-result analyses. Each request holds a slot of semaphore
+        (AI_CONCURRENCY slots by default) while in flight.
+        """
+        if not (self.async_mode and self.client):
+            logger.warning("Async AI client not available, skipping batch analysis")
+            return [None] * len(results)
+        
+        semaphore = semaphore or asyncio.Semaphore(self.concurrency)
+        async with self._async_session():
+            return await self._analyze_coalesced(results, semaphore)
+    
+    async def _analyze_coalesced(self, results: List[Dict[str, Any]],
+                                 semaphore: asyncio.Semaphore) -> List[Optional[str]]:
+        """Send one coalesced request, falling back to one request per result"""
+        async def request(prompt: str, max_tokens: Optional[int] = None) -> Optional[str]:
+            async with semaphore:
+                return await self._analyze_async(prompt, max_tokens)
+        
+        if len(results) == 1:
+            return [await request(self._prepare_analysis_prompt(results[0]))]
+        
+        response = await request(self._prepare_batch_prompt(results),
+                                 max_tokens=min(self.analysis_max_tokens * len(results),
+                                                self.max_output_tokens))
+        analyses = self._parse_batch_response(response, len(results))
+        if analyses is not None:
+            return analyses
+        
+        logger.warning(f"Could not parse coalesced AI analysis of {len(results)} results, "
+                       f"analyzing them individually")
+        return await asyncio.gather(*[
+            request(self._prepare_analysis_prompt(r)) for r in results
+        ])
+    
+    async def _analyze_async(self, prompt: str, max_tokens: Optional[int] = None) -> Optional[str]:
+        """Send one prompt to the configured provider without blocking"""
+        max_tokens = max_tokens or self.analysis_max_tokens
+        if self.provider == 'openai':
+            return await self._analyze_with_openai_async(prompt, max_tokens)
+        elif self.provider == 'anthropic':
+            return await self._analyze_with_anthropic_async(prompt, max_tokens)
+        return None
+    
+    def analyze_scan_results_batch_sync(self, results_list: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Blocking wrapper around analyze_scan_results_batch"""
+        return asyncio.run(self.analyze_scan_results_batch(results_list))
+    
     def _prepare_analysis_prompt(self, scan_results: Dict[str, Any]) -> str:
         """Prepare a prompt for AI analysis"""
-        prompt = "Analyze the following security scan results and provide:\n"
-        prompt += "1. Summary of critical issues\n"
-        prompt += "2. Prioritized recommendations\n"
-        prompt += "3. Risk assessment\n\n"
-        prompt += "Scan Results:\n"
-        prompt += f"Repository: {scan_results.get('repo_name', 'Unknown')}\n\n"
+        return self._prompt_header + self._summarize_findings(scan_results) + self._prompt_footer
+    
+    def _prepare_batch_prompt(self, results: List[Dict[str, Any]]) -> str:
+        """Prepare one prompt covering several scan results"""
+        count = len(results)
+        parts = [self._batch_prompt_header.format(count=count)]
+        for n, scan_results in enumerate(results, 1):
+            parts.append(f"=== Scan Result {n} ===\n")
+            parts.append(self._summarize_findings(scan_results))
+            parts.append("\n")
+        parts.append(_BATCH_PROMPT_FOOTER.format(count=count))
+        return "".join(parts)
+    
+    def _parse_batch_response(self, response: Optional[str], count: int) -> Optional[List[str]]:
+        """Split a coalesced response into per-result analyses, or None if malformed"""
+        if not response:
+            return None
+        # Models often wrap the array in a Markdown code fence or add a preamble
+        start, end = response.find('['), response.rfind(']')
+        if start == -1 or end < start:
+            return None
+        try:
+            analyses = json.loads(response[start:end + 1])
+        except ValueError:
+            return None
+        if (not isinstance(analyses, list) or len(analyses) != count
+                or not all(isinstance(a, str) and a.strip() for a in analyses)):
+            return None
+        return analyses
+    
+    def _summarize_findings(self, scan_results: Dict[str, Any]) -> str:
+        """Summarize one scan result's findings for a prompt"""
+        parts = [f"Repository: {scan_results.get('repo_name', 'Unknown')}\n\n"]
         
         # Vulnerability findings
         vuln_results = scan_results.get('vulnerability_scan', {})
         if vuln_results:
-            prompt += "Vulnerabilities:\n"
+            parts.append("Vulnerabilities:\n")
             
             python_vulns = vuln_results.get('python_dependencies', [])
             if python_vulns:
-                prompt += f"- Python dependency vulnerabilities: {len(python_vulns)} found\n"
+                parts.append(f"- Python dependency vulnerabilities: {len(python_vulns)} found\n")
             
             bandit_issues = vuln_results.get('bandit_issues', [])
             if bandit_issues:
-                prompt += f"- Bandit security issues: {len(bandit_issues)} found\n"
+                parts.append(f"- Bandit security issues: {len(bandit_issues)} found\n")
                 # Add severity breakdown
-                severity_counts = {}
-                for issue in bandit_issues:
-                    sev = issue.get('issue_severity', 'UNKNOWN')
-                    severity_counts[sev] = severity_counts.get(sev, 0) + 1
-                prompt += f"  Severity breakdown: {severity_counts}\n"
+                severity_counts = Counter(issue.get('issue_severity', 'UNKNOWN') for issue in bandit_issues)
+                parts.append(f"  Severity breakdown: {dict(severity_counts)}\n")
             
             common_issues = vuln_results.get('common_issues', [])
             if common_issues:
-                prompt += f"- Common security issues: {len(common_issues)} found\n"
+                parts.append(f"- Common security issues: {len(common_issues)} found\n")
         
         # Drupal module findings
         drupal_results = scan_results.get('drupal_check', {})
         if drupal_results and drupal_results.get('is_drupal'):
-            prompt += f"\nDrupal Analysis:\n"
-            prompt += f"- Drupal version: {drupal_results.get('drupal_version', 'unknown')}\n"
-            prompt += f"- Total modules: {drupal_results.get('total_modules', 0)}\n"
+            parts.append(f"\nDrupal Analysis:\n")
+            parts.append(f"- Drupal version: {drupal_results.get('drupal_version', 'unknown')}\n")
+            parts.append(f"- Total modules: {drupal_results.get('total_modules', 0)}\n")
             
             outdated = drupal_results.get('outdated_modules', [])
             if outdated:
-                prompt += f"- Outdated modules: {len(outdated)}\n"
+                parts.append(f"- Outdated modules: {len(outdated)}\n")
                 # Group by severity
-                severity_groups = {}
+                severity_groups = defaultdict(list)
                 for module in outdated:
-                    sev = module.get('severity', 'unknown')
-                    severity_groups.setdefault(sev, []).append(module['module'])
+                    severity_groups[module.get('severity', 'unknown')].append(module['module'])
                 
                 for sev, mods in severity_groups.items():
-                    prompt += f"  {sev.upper()}: {len(mods)} modules\n"
+                    parts.append(f"  {sev.upper()}: {len(mods)} modules\n")
         
-        prompt += "\nProvide a concise security analysis and recommendations."
-        return prompt
+        return "".join(parts)
     
     def _analyze_with_openai(self, prompt: str) -> str:
         """Get analysis from OpenAI or OpenAI-compatible API"""
@@ -137,10 +370,10 @@ class AIAnalyzer:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are a security analyst expert. Provide concise, actionable security recommendations."},
+                    {"role": "system", "content": self._system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=1000,
+                max_tokens=self.analysis_max_tokens,
                 temperature=0.7
             )
             return response.choices[0].message.content
@@ -153,7 +386,39 @@ class AIAnalyzer:
         try:
             response = self.client.messages.create(
                 model="claude-3-sonnet-20240229",
-                max_tokens=1000,
+                max_tokens=self.analysis_max_tokens,
+                messages=[
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            return response.content[0].text
+        except Exception as e:
+            logger.error(f"Anthropic API error: {e}")
+            return None
+    
+    async def _analyze_with_openai_async(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Get analysis from OpenAI or OpenAI-compatible API without blocking"""
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": self._system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=max_tokens,
+                temperature=0.7
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"OpenAI API error: {e}")
+            return None
+    
+    async def _analyze_with_anthropic_async(self, prompt: str, max_tokens: int) -> Optional[str]:
+        """Get analysis from Anthropic Claude without blocking"""
+        try:
+            response = await self.async_client.messages.create(
+                model="claude-3-sonnet-20240229",
+                max_tokens=max_tokens,
                 messages=[
                     {"role": "user", "content": prompt}
                 ]
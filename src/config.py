@@ -18,8 +18,12 @@ REPOS_FILE = BASE_DIR / 'repos.txt'
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
+OPENAI_QUANTIZATION_HINT = os.getenv('OPENAI_QUANTIZATION_HINT')
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
 
+# Short AI instructions and responses (useful for quantized local models)
+AI_TOKEN_EFFICIENT_PROMPT = os.getenv('AI_TOKEN_EFFICIENT_PROMPT', '').lower() in ('1', 'true', 'yes')
+
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
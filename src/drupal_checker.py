@@ -3,20 +3,78 @@ Drupal Module Checker - Checks for outdated Drupal contrib modules
 """
 import logging
 import json
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from requests.adapters import HTTPAdapter
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from packaging import version
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
 logger = logging.getLogger(__name__)
 
+# Leading numeric part of a version, e.g. "1.5" in "1.5.x-dev"
+_NUMERIC_VERSION_RE = re.compile(r'\d+(?:\.\d+)*')
+# Legacy Drupal core prefix, e.g. "8.x-" in "8.x-1.5"
+_CORE_PREFIX_RE = re.compile(r'^\d+\.x-')
+# Markers of dev, alpha, beta and rc releases
+_UNSTABLE_RE = re.compile(r'dev|alpha|beta|rc', re.IGNORECASE)
+# Largest composer.json we are willing to parse
+MAX_COMPOSER_SIZE = 10 * 1024 * 1024
+# Number of newest stable releases to read when streaming package metadata
+MAX_MODULE_VERSIONS = 20
+
+
+def _json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when it is installed"""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 class DrupalModuleChecker:
     """Checks Drupal composer.json for outdated contrib modules"""
     
-    def __init__(self):
+    # Packages whose presence marks a Drupal project
+    _DRUPAL_CORE = frozenset({
+        'drupal/core',
+        'drupal/core-recommended',
+        'drupal/core-composer-scaffold'
+    })
+    # drupal/* packages that are part of core rather than contrib modules
+    _CORE_PACKAGES = _DRUPAL_CORE | {'drupal/core-dev'}
+    
+    def __init__(self, cache_expire: int = 3600):
         self.packagist_url = 'https://packages.drupal.org/8/packages.json'
         self.package_cache = None
+        # Reuse connections to packages.drupal.org across module lookups, and
+        # persist responses between runs when requests-cache is installed
+        if requests_cache:
+            self.session = requests_cache.CachedSession(
+                'drupal_packages_cache',
+                expire_after=cache_expire
+            )
+        else:
+            self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32))
+        self._versions_cache = {}
+        self._parsed_versions = {}
     
     def check_repository(self, repo_path: Path) -> Optional[Dict[str, Any]]:
         """Check if repository is a Drupal project and analyze modules"""
@@ -27,8 +85,11 @@ class DrupalModuleChecker:
             return None
         
         try:
-            with open(composer_file, 'r') as f:
-                composer_data = json.load(f)
+            if composer_file.stat().st_size > MAX_COMPOSER_SIZE:
+                logger.warning(f"composer.json in {repo_path.name} is too large, skipping")
+                return None
+            
+            composer_data = _json_loads(composer_file.read_bytes())
             
             # Check if this is a Drupal project
             if not self._is_drupal_project(composer_data):
@@ -50,9 +111,8 @@ class DrupalModuleChecker:
             modules = self._extract_drupal_modules(composer_data)
             results['total_modules'] = len(modules)
             
-            # Get all modules with their GitHub URLs
-            results['modules'] = self._get_all_modules_info(modules)
-            results['outdated_modules'] = self._check_outdated_modules(modules)
+            # Get all modules with their GitHub URLs and find outdated ones
+            results['modules'], results['outdated_modules'] = self._analyze_modules(modules)
             
             return results
             
@@ -65,16 +125,8 @@ class DrupalModuleChecker:
     
     def _is_drupal_project(self, composer_data: Dict) -> bool:
         """Check if composer.json indicates a Drupal project"""
-        require = composer_data.get('require', {})
-        
         # Check for Drupal core
-        drupal_indicators = [
-            'drupal/core',
-            'drupal/core-recommended',
-            'drupal/core-composer-scaffold'
-        ]
-        
-        return any(indicator in require for indicator in drupal_indicators)
+        return not self._DRUPAL_CORE.isdisjoint(composer_data.get('require', {}))
     
     def _get_drupal_version(self, composer_data: Dict) -> str:
         """Extract Drupal core version"""
@@ -93,24 +145,26 @@ class DrupalModuleChecker:
         
         for package, version_constraint in require.items():
             # Drupal contrib modules follow the pattern drupal/module_name
-            if package.startswith('drupal/') and package not in [
-                'drupal/core',
-                'drupal/core-recommended',
-                'drupal/core-composer-scaffold',
-                'drupal/core-dev'
-            ]:
+            if package.startswith('drupal/') and package not in self._CORE_PACKAGES:
                 modules[package] = version_constraint
         
         return modules
     
-    def _get_all_modules_info(self, modules: Dict[str, str]) -> List[Dict[str, Any]]:
-        """Get information for all modules including repository URLs"""
+    def _analyze_modules(self, modules: Dict[str, str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Collect info for all modules and find outdated ones in a single pass"""
         modules_info = []
+        outdated = []
         
         # Load Drupal package data if not already loaded
-        if not self.package_cache:
+        if self.package_cache is None:
             self._load_package_data()
         
+        if self.package_cache is None:
+            logger.warning("Could not load Drupal package data")
+            return modules_info, outdated
+        
+        self._prefetch_module_versions(modules)
+        
         for module_name, current_version in modules.items():
             repo_url = self._get_module_github_url(module_name)
             latest = self._get_latest_version(module_name)
@@ -121,41 +175,25 @@ class DrupalModuleChecker:
                 'latest_version': latest or 'unknown',
                 'repository_url': repo_url
             })
-        
-        return modules_info
-    
-    def _check_outdated_modules(self, modules: Dict[str, str]) -> List[Dict[str, Any]]:
-        """Check which modules have newer versions available"""
-        outdated = []
-        
-        # Load Drupal package data
-        if not self.package_cache:
-            self._load_package_data()
-        
-        if not self.package_cache:
-            logger.warning("Could not load Drupal package data")
-            return outdated
-        
-        for module_name, current_version in modules.items():
-            latest = self._get_latest_version(module_name)
-            repo_url = self._get_module_github_url(module_name)
             
-            if latest:
-                try:
-                    # Clean version strings for comparison
-                    current = self._clean_version(current_version)
-                    if current and self._is_outdated(current, latest):
-                        outdated.append({
-                            'module': module_name,
-                            'current_version': current_version,
-                            'latest_version': latest,
-                            'severity': self._calculate_update_severity(current, latest),
-                            'repository_url': repo_url
-                        })
-                except Exception as e:
-                    logger.debug(f"Could not compare versions for {module_name}: {e}")
+            if not latest:
+                continue
+            
+            # Parse both sides once and reuse them for every comparison
+            current = self._parse_version(self._clean_version(current_version))
+            latest_parsed = self._parse_version(latest)
+            if current and latest_parsed and self._is_outdated(current, latest_parsed):
+                outdated.append({
+                    'module': module_name,
+                    'current_version': current_version,
+                    'latest_version': latest,
+                    'severity': self._calculate_update_severity(current, latest_parsed),
+                    'repository_url': repo_url
+                })
+            elif not current:
+                logger.debug(f"Could not compare versions for {module_name}: {current_version}")
         
-        return outdated
+        return modules_info, outdated
     
     def _load_package_data(self):
         """Load Drupal package data from packages.drupal.org"""
@@ -168,17 +206,36 @@ class DrupalModuleChecker:
             logger.error(f"Failed to initialize Drupal package data: {e}")
             self.package_cache = None
     
+    def _prefetch_module_versions(self, modules: Dict[str, str], workers: int = 16):
+        """Fetch version data for all uncached modules concurrently"""
+        pending = [name for name in modules if name not in self._versions_cache]
+        if pending:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(self._fetch_module_versions, pending))
+    
     def _fetch_module_versions(self, module_name: str) -> Optional[list]:
         """Fetch version data for a specific module from Drupal packages API"""
+        if module_name in self._versions_cache:
+            return self._versions_cache[module_name]
+        
+        versions = self._request_module_versions(module_name)
+        self._versions_cache[module_name] = versions
+        return versions
+    
+    def _request_module_versions(self, module_name: str) -> Optional[list]:
+        """Request version data for a module from packages.drupal.org"""
         try:
             # Use the p2 endpoint format
             # https://packages.drupal.org/files/packages/8/p2/drupal/MODULE_NAME.json
             module_short_name = module_name.replace('drupal/', '')
             url = f"https://packages.drupal.org/files/packages/8/p2/drupal/{module_short_name}.json"
             
-            response = requests.get(url, timeout=10)
+            if ijson:
+                return self._stream_module_versions(url, module_name)
+            
+            response = self.session.get(url, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 if 'packages' in data and module_name in data['packages']:
                     return data['packages'][module_name]
             return None
@@ -186,6 +243,25 @@ class DrupalModuleChecker:
             logger.debug(f"Failed to fetch versions for {module_name}: {e}")
             return None
     
+    def _stream_module_versions(self, url: str, module_name: str) -> Optional[list]:
+        """Incrementally parse only the newest releases from a package metadata file"""
+        # Releases are listed newest first, so the tail of large files can be skipped
+        with self.session.get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            response.raw.decode_content = True
+            # Count only stable releases, so a run of pre-releases at the top
+            # cannot crowd out the versions _get_latest_version looks at
+            items = []
+            stable = 0
+            for item in ijson.items(response.raw, f'packages.{module_name}.item'):
+                items.append(item)
+                if self._is_stable_release(item):
+                    stable += 1
+                    if stable == MAX_MODULE_VERSIONS:
+                        break
+            return items or None
+    
     def _get_module_github_url(self, module_name: str) -> Optional[str]:
         """Get the GitHub or Drupal.org repository URL for a module"""
         # Try to get from API
@@ -222,6 +298,13 @@ class DrupalModuleChecker:
         module_short_name = module_name.replace('drupal/', '')
         return f"https://www.drupal.org/project/{module_short_name}"
     
+    @staticmethod
+    def _is_stable_release(ver_data: Any) -> bool:
+        """Check whether a package metadata entry is a stable release"""
+        # Skip dev, alpha, beta, rc versions
+        return (isinstance(ver_data, dict) and 'version' in ver_data
+                and not _UNSTABLE_RE.search(ver_data['version']))
+    
     def _get_latest_version(self, module_name: str) -> Optional[str]:
         """Get the latest stable version of a module"""
         versions_list = self._fetch_module_versions(module_name)
@@ -230,50 +313,52 @@ class DrupalModuleChecker:
             return None
         
         # Filter and collect stable versions
-        stable_versions = []
-        for ver_data in versions_list:
-            if isinstance(ver_data, dict) and 'version' in ver_data:
-                ver_string = ver_data['version']
-                # Skip dev, alpha, beta, rc versions
-                ver_lower = ver_string.lower()
-                if any(unstable in ver_lower for unstable in ['dev', 'alpha', 'beta', 'rc', 'x-dev']):
-                    continue
-                stable_versions.append(ver_string)
+        stable_versions = [ver_data['version'] for ver_data in versions_list
+                           if self._is_stable_release(ver_data)]
         
-        if stable_versions:
-            # Sort versions and return the latest
-            try:
-                stable_versions.sort(key=lambda v: version.parse(v), reverse=True)
-                return stable_versions[0]
-            except Exception as e:
-                logger.debug(f"Error sorting versions for {module_name}: {e}")
-                # Fallback: return the first version found
-                return stable_versions[0] if stable_versions else None
+        # Parse each version once up front instead of inside the sort key
+        parsed = []
+        for ver_string in stable_versions:
+            parsed_version = self._parse_version(ver_string)
+            if parsed_version is not None:
+                parsed.append((parsed_version, ver_string))
+        
+        if parsed:
+            return max(parsed, key=itemgetter(0))[1]
         
-        return None
+        # Fallback: return the first version found
+        return stable_versions[0] if stable_versions else None
+    
+    def _parse_version(self, ver_string: Optional[str]) -> Optional[version.Version]:
+        """Parse a version string, caching the result"""
+        if not ver_string:
+            return None
+        if ver_string not in self._parsed_versions:
+            try:
+                self._parsed_versions[ver_string] = version.parse(ver_string)
+            except version.InvalidVersion:
+                logger.debug(f"Could not parse version: {ver_string}")
+                self._parsed_versions[ver_string] = None
+        return self._parsed_versions[ver_string]
+    
+    def _clean_version(self, constraint: str) -> Optional[str]:
+        """Reduce a composer version constraint to a comparable version string"""
+        # For alternatives such as "^1.0 || ^2.0" the last one is the newest allowed
+        candidate = constraint.split('||')[-1].strip()
+        candidate = _CORE_PREFIX_RE.sub('', candidate.lstrip('^~>=<v '))
+        match = _NUMERIC_VERSION_RE.match(candidate)
+        return match.group(0) if match else None
     
-    def _is_outdated(self, current: str, latest: str) -> bool:
+    def _is_outdated(self, current: version.Version, latest: version.Version) -> bool:
         """Check if current version is outdated"""
-        try:
-            return version.parse(current) < version.parse(latest)
-        except:
-            return False
+        return current < latest
     
-    def _calculate_update_severity(self, current: str, latest: str) -> str:
+    def _calculate_update_severity(self, current: version.Version, latest: version.Version) -> str:
         """Calculate the severity of the update needed"""
-        try:
-            curr = version.parse(current)
-            late = version.parse(latest)
-            
-            # Compare major, minor, patch versions
-            if hasattr(curr, 'major') and hasattr(late, 'major'):
-                if late.major > curr.major:
-                    return 'major'
-                elif late.minor > curr.minor:
-                    return 'minor'
-                else:
-                    return 'patch'
-        except:
-            pass
-        
-        return 'unknown'
+        # Compare major, minor, patch versions
+        if latest.major > current.major:
+            return 'major'
+        elif latest.minor > current.minor:
+            return 'minor'
+        else:
+            return 'patch'
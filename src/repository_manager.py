@@ -1,68 +1,205 @@
 """
 Repository Manager - Handles cloning and managing repositories
 """
+import hashlib
 import logging
+import os
 import shutil
+import subprocess
+import tempfile
+import threading
 from pathlib import Path
-from typing import List, Optional
-from git import Repo, GitCommandError
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 
+def _fast_rmtree(path: Path):
+    """Remove a directory tree, letting the OS do the walk on POSIX"""
+    if os.name == 'posix':
+        subprocess.run(['rm', '-rf', str(path)], check=True)
+    else:
+        shutil.rmtree(path)
+
+
 class RepositoryManager:
     """Manages repository cloning and cleanup"""
     
     def __init__(self, temp_dir: Path):
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
+        # Kept apart from the per-URL checkout directories (hex URL keys)
+        self.cache_dir = self.temp_dir / '.clone-cache'
+        self._url_locks: Dict[str, threading.Lock] = {}
+        self._url_locks_guard = threading.Lock()
         
     def read_repos_list(self, repos_file: Path) -> List[str]:
         """Read repository URLs from a text file"""
-        repos = []
         try:
-            with open(repos_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    # Skip empty lines and comments
-                    if line and not line.startswith('#'):
-                        repos.append(line)
+            repos = list(self.read_repos_iter(repos_file))
             logger.info(f"Found {len(repos)} repositories to scan")
             return repos
         except FileNotFoundError:
             logger.error(f"Repository list file not found: {repos_file}")
             return []
     
-    def clone_repository(self, repo_url: str) -> Optional[Path]:
+    def read_repos_iter(self, repos_file: Path) -> Iterator[str]:
+        """Yield repository URLs from a text file one at a time"""
+        with open(repos_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                # Skip empty lines and comments
+                if line and not line.startswith('#'):
+                    yield line
+    
+    def count_repos(self, repos_file: Path) -> int:
+        """Count repository URLs in a text file without keeping them in memory"""
+        try:
+            count = sum(1 for _ in self.read_repos_iter(repos_file))
+            logger.info(f"Found {count} repositories to scan")
+            return count
+        except FileNotFoundError:
+            logger.error(f"Repository list file not found: {repos_file}")
+            return 0
+    
+    def clone_repository(self, repo_url: str, branch: Optional[str] = None) -> Optional[Path]:
         """Clone a repository to the temporary directory"""
+        # A fresh directory per call, so same-named repositories (forks, mirrors)
+        # and duplicate URLs cloned concurrently never share a checkout
         try:
-            # Extract repo name from URL
-            repo_name = repo_url.rstrip('/').split('/')[-1].replace('.git', '')
-            repo_path = self.temp_dir / repo_name
+            parent = Path(tempfile.mkdtemp(prefix=f"{self.url_key(repo_url)}-", dir=self.temp_dir))
+        except Exception as e:
+            logger.error(f"Unexpected error cloning {repo_url}: {e}")
+            return None
+        
+        repo_path = self._clone(repo_url, parent / self._repo_name(repo_url), branch)
+        if not repo_path:
+            self.cleanup_repository(parent / self._repo_name(repo_url))
+        return repo_path
+    
+    def get_or_clone(self, repo_url: str, force: bool = False) -> Tuple[Optional[Path], bool]:
+        """Return a checkout of the remote HEAD, reusing a cached clone when it is current
+        
+        The second element tells whether the checkout lives in the clone cache,
+        in which case callers must not clean it up.
+        """
+        if force:
+            return self.clone_repository(repo_url), False
+        
+        head = self._remote_head(repo_url)
+        if not head:
+            return self.clone_repository(repo_url), False
+        
+        # Entries are keyed by URL and HEAD commit, so a new push misses the cache
+        url_key = self.url_key(repo_url)
+        entry = self.cache_dir / f"{url_key}-{head[:12]}"
+        repo_path = entry / self._repo_name(repo_url)
+        
+        # Duplicate URLs in the list wait for the first clone instead of racing it
+        with self._url_lock(url_key):
+            # Entries are only moved into place once fully cloned
+            if entry.exists():
+                logger.info(f"Using cached clone of {repo_url} at {head[:12]}")
+                return repo_path, True
             
-            # Remove existing directory if it exists
-            if repo_path.exists():
-                logger.info(f"Removing existing directory: {repo_path}")
-                shutil.rmtree(repo_path)
+            staging = self.cache_dir / f"{url_key}.partial"
+            try:
+                # Drop clones of older commits and leftovers of interrupted clones
+                for stale in self.cache_dir.glob(f"{url_key}[-.]*"):
+                    _fast_rmtree(stale)
+                staging.mkdir(parents=True)
+            except Exception as e:
+                logger.error(f"Failed to prepare clone cache for {repo_url}: {e}")
+                return self.clone_repository(repo_url), False
             
+            if not self._clone(repo_url, staging / repo_path.name):
+                self.cleanup_repository(staging)
+                return None, False
+            
+            try:
+                os.replace(staging, entry)
+            except OSError as e:
+                logger.error(f"Failed to add {repo_url} to clone cache: {e}")
+                self.cleanup_repository(staging)
+                return None, False
+        
+        return repo_path, True
+    
+    def prune_cache(self, keep_urls: Iterable[str]):
+        """Remove cached clones of repositories not in keep_urls"""
+        keep = tuple(self.url_key(url) for url in keep_urls)
+        try:
+            if not self.cache_dir.exists():
+                return
+            for entry in self.cache_dir.iterdir():
+                if not entry.name.startswith(keep):
+                    _fast_rmtree(entry)
+                    logger.info(f"Pruned cached clone: {entry}")
+        except Exception as e:
+            logger.error(f"Failed to prune clone cache: {e}")
+    
+    def _url_lock(self, url_key: str) -> threading.Lock:
+        """Return the lock serializing cache access for one repository URL"""
+        with self._url_locks_guard:
+            return self._url_locks.setdefault(url_key, threading.Lock())
+    
+    def _remote_head(self, repo_url: str) -> Optional[str]:
+        """Look up the commit the remote HEAD points to"""
+        try:
+            output = subprocess.run(['git', 'ls-remote', repo_url, 'HEAD'],
+                                    capture_output=True, text=True, check=True).stdout
+        except subprocess.CalledProcessError as e:
+            logger.warning(f"Could not resolve HEAD of {repo_url}: {e.stderr.strip()}")
+            return None
+        except Exception as e:
+            logger.warning(f"Could not resolve HEAD of {repo_url}: {e}")
+            return None
+        
+        fields = output.split()
+        return fields[0] if fields else None
+    
+    def _clone(self, repo_url: str, repo_path: Path, branch: Optional[str] = None) -> Optional[Path]:
+        """Shallow-clone a repository into repo_path"""
+        try:
             logger.info(f"Cloning repository: {repo_url}")
-            Repo.clone_from(repo_url, repo_path)
+            # Scanners only read the checked-out tree, so skip history and tags
+            command = ['git', 'clone', '--depth=1', '--filter=blob:none', '--single-branch', '--no-tags']
+            if branch:
+                command += ['--branch', branch]
+            command += [repo_url, str(repo_path)]
+            subprocess.run(command, capture_output=True, text=True, check=True)
             logger.info(f"Successfully cloned to: {repo_path}")
             return repo_path
             
-        except GitCommandError as e:
-            logger.error(f"Failed to clone {repo_url}: {e}")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to clone {repo_url}: {e.stderr.strip()}")
             return None
         except Exception as e:
             logger.error(f"Unexpected error cloning {repo_url}: {e}")
             return None
     
+    @staticmethod
+    def url_key(repo_url: str) -> str:
+        """Short stable hash identifying a repository URL"""
+        return hashlib.sha256(repo_url.encode('utf-8')).hexdigest()[:16]
+    
+    @staticmethod
+    def _repo_name(repo_url: str) -> str:
+        """Extract the repository name from its URL"""
+        return repo_url.rstrip('/').split('/')[-1].replace('.git', '')
+    
     def cleanup_repository(self, repo_path: Path):
         """Remove a cloned repository"""
         try:
             if repo_path.exists():
-                shutil.rmtree(repo_path)
+                _fast_rmtree(repo_path)
                 logger.info(f"Cleaned up repository: {repo_path}")
+            # Drop the directory clone_repository created around it
+            if repo_path.parent != self.temp_dir and repo_path.parent.exists():
+                try:
+                    repo_path.parent.rmdir()
+                except OSError:
+                    pass
         except Exception as e:
             logger.error(f"Failed to cleanup {repo_path}: {e}")
     
@@ -70,7 +207,7 @@ class RepositoryManager:
         """Remove all cloned repositories"""
         try:
             if self.temp_dir.exists():
-                shutil.rmtree(self.temp_dir)
+                _fast_rmtree(self.temp_dir)
                 self.temp_dir.mkdir(exist_ok=True)
                 logger.info("Cleaned up all temporary repositories")
         except Exception as e:
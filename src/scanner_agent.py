@@ -1,21 +1,32 @@
 """
 Main Scanner Agent - Orchestrates the scanning process
 """
+import asyncio
 import logging
-import json
+import multiprocessing
+import os
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any
+from itertools import islice
+from typing import Dict, Any, Iterable, Optional
+
+from jinja2 import BaseLoader, Environment
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from config import TEMP_DIR, OUTPUT_DIR, REPOS_FILE, LOG_LEVEL, OPENAI_MODEL, OPENAI_BASE_URL
+from config import (
+    TEMP_DIR, OUTPUT_DIR, REPOS_FILE, LOG_LEVEL, OPENAI_MODEL, OPENAI_BASE_URL,
+    OPENAI_QUANTIZATION_HINT, AI_TOKEN_EFFICIENT_PROMPT
+)
+from ai_analyzer import AIAnalyzer, count_findings
 from repository_manager import RepositoryManager
 from vulnerability_scanner import VulnerabilityScanner
 from drupal_checker import DrupalModuleChecker
-from ai_analyzer import AIAnalyzer
 
 # Configure logging
 logging.basicConfig(
@@ -29,12 +40,204 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Start scan workers from a clean process rather than by forking this one
+_WORKER_START_METHOD = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                        else 'spawn')
+
+
+def _format_scan_time(scan_time_ns: Optional[int]) -> str:
+    """Format a time.time_ns() stamp as an ISO 8601 local time"""
+    if scan_time_ns is None:
+        return 'N/A'
+    # Integer math: a float of the whole stamp cannot hold every microsecond
+    seconds, ns = divmod(scan_time_ns, 10**9)
+    return datetime.fromtimestamp(seconds).replace(microsecond=ns // 1000).isoformat()
+
+
+# Text report layouts. Lines holding only a block tag disappear from the
+# output (trim_blocks/lstrip_blocks), so each remaining line maps 1:1 to
+# a line of the rendered report
+_REPORT_SRC = """\
+{{ double_rule }}
+SECURITY SCAN REPORT: {{ r['repo_name'] | default('Unknown') }}
+{{ double_rule }}
+
+Repository URL: {{ r['repo_url'] | default('N/A') }}
+Scan Time: {{ r['scan_time_ns'] | default(none) | scan_time }}
+Status: {{ r['status'] | default('N/A') | upper }}
+
+{{ rule }}
+
+{% set vuln = r['vulnerability_scan'] | default({}) %}
+{% if vuln %}
+VULNERABILITY SCAN RESULTS
+{{ rule }}
+
+{% set py_deps = vuln['python_dependencies'] | default([]) %}
+{% if py_deps %}
+⚠️  PYTHON VULNERABILITIES ({{ py_deps | length }} found)
+
+{% for dep in py_deps %}
+  • Package: {{ dep }}
+{% endfor %}
+
+{% else %}
+✓ No Python dependency vulnerabilities found
+
+{% endif %}
+{% set bandit = vuln['bandit_issues'] | default([]) %}
+{% if bandit %}
+⚠️  SECURITY CODE ISSUES ({{ bandit | length }} found)
+
+{% for issue in bandit %}
+  • {{ issue }}
+{% endfor %}
+
+{% else %}
+✓ No security code issues found
+
+{% endif %}
+{% set common = vuln['common_issues'] | default([]) %}
+{% if common %}
+ℹ️  COMMON ISSUES ({{ common | length }} found)
+
+{% for issue in common %}
+  • {{ issue }}
+{% endfor %}
+
+{% endif %}
+{{ rule }}
+
+{% endif %}
+{% set drupal = r['drupal_check'] | default({}) %}
+{% if drupal and drupal['is_drupal'] %}
+DRUPAL PROJECT ANALYSIS
+{{ rule }}
+
+Drupal Version: {{ drupal['drupal_version'] | default('Unknown') }}
+Total Contrib Modules: {{ drupal['total_modules'] | default(0) }}
+
+{% set modules = drupal['modules'] | default([]) %}
+{% if modules %}
+INSTALLED MODULES:
+
+{% for mod in modules %}
+  📦 {{ mod['module'] | default('Unknown') }}
+     Current Version: {{ mod['current_version'] | default('N/A') }}
+     Latest Version: {{ mod['latest_version'] | default('N/A') }}
+{% if mod['repository_url'] %}
+     Repository: {{ mod['repository_url'] }}
+{% endif %}
+
+{% endfor %}
+{% endif %}
+{% set outdated = drupal['outdated_modules'] | default([]) %}
+{% if outdated %}
+
+⚠️  OUTDATED MODULES ({{ outdated | length }} need updates):
+
+{% for mod in outdated %}
+  📦 {{ mod['module'] | default('Unknown') }}
+     Current: {{ mod['current_version'] | default('N/A') }}
+     Latest: {{ mod['latest_version'] | default('N/A') }}
+     Update Severity: {{ mod['severity'] | default('unknown') | upper }}
+{% if mod['repository_url'] %}
+     Repository: {{ mod['repository_url'] }}
+{% endif %}
+
+{% endfor %}
+{% else %}
+✓ All modules are up to date
+
+{% endif %}
+{{ rule }}
+
+{% endif %}
+{% if r['ai_analysis'] %}
+AI-POWERED SECURITY ANALYSIS
+{{ rule }}
+
+{{ r['ai_analysis'] }}
+
+{{ rule }}
+
+{% endif %}
+
+End of Report
+{{ double_rule }}
+"""
+
+_SUMMARY_SRC = """\
+{{ double_rule }}
+SECURITY SCAN SUMMARY REPORT
+{{ double_rule }}
+
+Scan Date: {{ s['scan_date'] }}
+Total Repositories: {{ s['total_repositories'] }}
+Successful Scans: {{ s['successful_scans'] }}
+Failed Scans: {{ s['failed_scans'] }}
+
+{{ rule }}
+
+{% for result in s['results'] %}
+{% set status = result['status'] | default('unknown') %}
+
+📁 REPOSITORY: {{ result['repo_name'] | default('Unknown') }}
+   URL: {{ result['repo_url'] | default('N/A') }}
+   Status: {{ status | upper }}
+{% if status == 'completed' %}
+{% set vuln = result['vulnerability_scan'] | default({}) %}
+{% if vuln %}
+{% set py_vulns = vuln['python_dependencies'] | default([]) | length %}
+{% set bandit_issues = vuln['bandit_issues'] | default([]) | length %}
+{% set common_issues = vuln['common_issues'] | default([]) | length %}
+{% if py_vulns > 0 %}
+   ⚠️  Python Vulnerabilities: {{ py_vulns }}
+{% endif %}
+{% if bandit_issues > 0 %}
+   ⚠️  Security Code Issues: {{ bandit_issues }}
+{% endif %}
+{% if common_issues > 0 %}
+   ℹ️  Common Issues: {{ common_issues }}
+{% endif %}
+{% endif %}
+{% set drupal = result['drupal_check'] | default({}) %}
+{% if drupal and drupal['is_drupal'] %}
+{% set outdated = drupal['outdated_modules'] | default([]) | length %}
+   🔷 Drupal Version: {{ drupal['drupal_version'] | default('Unknown') }}
+   📦 Total Modules: {{ drupal['total_modules'] | default(0) }}
+{% if outdated > 0 %}
+   ⚠️  Outdated Modules: {{ outdated }}
+{% endif %}
+{% endif %}
+{% else %}
+   ❌ Error: {{ result['error'] | default('Unknown error') }}
+{% endif %}
+
+{{ rule }}
+{% endfor %}
+
+{{ double_rule }}
+End of Summary Report
+{{ double_rule }}
+"""
+
+# Templates are compiled once at import and reused for every report
+_TEMPLATE_ENV = Environment(loader=BaseLoader(), trim_blocks=True,
+                            lstrip_blocks=True, keep_trailing_newline=True)
+_TEMPLATE_ENV.filters['scan_time'] = _format_scan_time
+_TEMPLATE_ENV.globals.update(rule="-" * 80, double_rule="=" * 80)
+_REPORT_TEMPLATE = _TEMPLATE_ENV.from_string(_REPORT_SRC)
+_SUMMARY_TEMPLATE = _TEMPLATE_ENV.from_string(_SUMMARY_SRC)
+
 
 class ScannerAgent:
     """Main AI agent that orchestrates repository scanning"""
     
     def __init__(self, use_ai: bool = True, ai_provider: str = 'openai', 
-                 ai_model: str = None, ai_base_url: str = None):
+                 ai_model: str = None, ai_base_url: str = None,
+                 token_efficient_prompt: bool = False, max_concurrent: int = 4,
+                 force_clone: bool = False):
         self.repo_manager = RepositoryManager(TEMP_DIR)
         self.vuln_scanner = VulnerabilityScanner()
         self.drupal_checker = DrupalModuleChecker()
@@ -43,12 +246,20 @@ class ScannerAgent:
             self.ai_analyzer = AIAnalyzer(
                 provider=ai_provider,
                 model=ai_model or OPENAI_MODEL,
-                base_url=ai_base_url or OPENAI_BASE_URL
+                base_url=ai_base_url or OPENAI_BASE_URL,
+                async_mode=True,
+                quantization_hint=OPENAI_QUANTIZATION_HINT,
+                token_efficient_prompt=token_efficient_prompt or AI_TOKEN_EFFICIENT_PROMPT
             )
         else:
             self.ai_analyzer = None
             
+        self.max_concurrent = max_concurrent
+        self.force_clone = force_clone
         self.results = []
+        self._status_counts = Counter()
+        self._run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self._pool = None
         
     def run(self, cleanup: bool = True):
         """Main execution flow"""
@@ -56,34 +267,90 @@ class ScannerAgent:
         logger.info("Starting Scanner AI Agent")
         logger.info("=" * 60)
         
-        # Read repository list
-        repos = self.repo_manager.read_repos_list(REPOS_FILE)
+        # One timestamp names every report written by this run
+        self._run_timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         
-        if not repos:
+        # Count repositories; the list itself is streamed while scanning
+        total = self.repo_manager.count_repos(REPOS_FILE)
+        
+        if not total:
             logger.error("No repositories to scan. Please add URLs to repos.txt")
             return
         
-        # Process each repository
-        for i, repo_url in enumerate(repos, 1):
-            logger.info(f"\n[{i}/{len(repos)}] Processing: {repo_url}")
-            self._process_repository(repo_url, cleanup)
+        # Scan repositories concurrently, then analyze and save the results.
+        # Vulnerability scans run in worker processes so their Python-side
+        # work is not serialized by the GIL. No more scans than repositories
+        # in flight can be pending, and workers must not be forked from this
+        # threaded process: a lock held by another thread (e.g. logging's)
+        # would stay locked in the child forever
+        self._pool = ProcessPoolExecutor(
+            max_workers=min(os.cpu_count() or 1, self.max_concurrent),
+            mp_context=multiprocessing.get_context(_WORKER_START_METHOD),
+        )
+        try:
+            asyncio.run(self._run_async(self.repo_manager.read_repos_iter(REPOS_FILE), total, cleanup))
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+        
+        if cleanup:
+            # Cached clones are kept only for repositories still being scanned
+            self.repo_manager.prune_cache(self.repo_manager.read_repos_iter(REPOS_FILE))
         
         # Generate final report
         self._generate_report()
         
         logger.info("\n" + "=" * 60)
         logger.info("Scan complete!")
-        logger.info(f"Results saved to: {OUTPUT_DIR}")
+        logger.info("Results saved to: %s", OUTPUT_DIR)
         logger.info("=" * 60)
     
-    def _process_repository(self, repo_url: str, cleanup: bool = True):
+    async def _run_async(self, repos: Iterable[str], total: int, cleanup: bool = True):
+        """Process repositories concurrently, then run AI analysis on results with findings"""
+        # One slot per repository keeps results in repos.txt order however
+        # the concurrent scans finish
+        self.results = [None] * total
+        self._status_counts = Counter()
+        
+        # Workers pull from one shared iterator, so at most max_concurrent
+        # repositories are in flight and the list is read as scanning proceeds
+        pending = islice(enumerate(repos), total)
+        
+        async def worker():
+            for idx, repo_url in pending:
+                logger.info("\n[%d/%d] Processing: %s", idx + 1, total, repo_url)
+                await self._process_repository(idx, repo_url, cleanup)
+        
+        await asyncio.gather(*[worker() for _ in range(min(self.max_concurrent, total))])
+        
+        # AI analysis, batched so API calls for all repositories overlap.
+        # Only these results were held back; the rest are already saved
+        to_analyze = [r for r in self.results
+                      if r and r.get('status') == 'completed' and self._awaits_ai(r)]
+        if not to_analyze:
+            return
+        
+        try:
+            logger.info("Running AI analysis...")
+            analyses = await self.ai_analyzer.analyze_scan_results_batch(to_analyze)
+            for scan_result, ai_analysis in zip(to_analyze, analyses):
+                if ai_analysis:
+                    scan_result['ai_analysis'] = ai_analysis
+        finally:
+            # Save individual results, with or without their analysis
+            for scan_result in to_analyze:
+                self._save_individual_result(scan_result)
+    
+    async def _process_repository(self, idx: int, repo_url: str, cleanup: bool = True):
         """Process a single repository"""
-        # Clone repository
-        repo_path = self.repo_manager.clone_repository(repo_url)
+        # Clone repository; blocking work runs in threads so repositories overlap
+        repo_path, cached = await asyncio.to_thread(
+            self.repo_manager.get_or_clone, repo_url, self.force_clone
+        )
         
         if not repo_path:
-            logger.error(f"Failed to clone repository: {repo_url}")
-            self.results.append({
+            logger.error("Failed to clone repository: %s", repo_url)
+            self._record_result(idx, {
                 'repo_url': repo_url,
                 'status': 'failed',
                 'error': 'Clone failed'
@@ -95,173 +362,93 @@ class ScannerAgent:
             scan_result = {
                 'repo_url': repo_url,
                 'repo_name': repo_path.name,
-                'scan_time': datetime.now().isoformat(),
+                'scan_time_ns': time.time_ns(),
                 'status': 'completed'
             }
             
-            # Vulnerability scan
-            logger.info("Running vulnerability scan...")
-            scan_result['vulnerability_scan'] = self.vuln_scanner.scan_repository(repo_path)
-            
-            # Drupal module check
-            logger.info("Checking for Drupal modules...")
-            drupal_result = self.drupal_checker.check_repository(repo_path)
+            # Vulnerability scan and Drupal module check are independent, so overlap them
+            logger.info("Running vulnerability scan and checking for Drupal modules...")
+            loop = asyncio.get_running_loop()
+            scan_result['vulnerability_scan'], drupal_result = await asyncio.gather(
+                loop.run_in_executor(self._pool, self.vuln_scanner.scan_repository, repo_path),
+                asyncio.to_thread(self.drupal_checker.check_repository, repo_path)
+            )
             if drupal_result:
                 scan_result['drupal_check'] = drupal_result
             
-            # AI analysis
-            if self.ai_analyzer:
-                logger.info("Running AI analysis...")
-                ai_analysis = self.ai_analyzer.analyze_scan_results(scan_result)
-                if ai_analysis:
-                    scan_result['ai_analysis'] = ai_analysis
-            
-            self.results.append(scan_result)
-            
-            # Save individual result
-            self._save_individual_result(scan_result)
+            self._record_result(idx, scan_result)
+            # Save right away unless the report has to wait for its AI analysis,
+            # so an interrupted run keeps what it has scanned
+            if not self._awaits_ai(scan_result):
+                self._save_individual_result(scan_result)
             
         except Exception as e:
-            logger.error(f"Error processing repository: {e}", exc_info=True)
-            self.results.append({
+            logger.error("Error processing repository: %s", e, exc_info=True)
+            self._record_result(idx, {
                 'repo_url': repo_url,
                 'status': 'error',
                 'error': str(e)
             })
         
         finally:
-            # Cleanup
-            if cleanup:
-                self.repo_manager.cleanup_repository(repo_path)
+            # Cleanup; cached clones are kept for the next run
+            if cleanup and not cached:
+                await asyncio.to_thread(self.repo_manager.cleanup_repository, repo_path)
+    
+    def _awaits_ai(self, result: Dict[str, Any]) -> bool:
+        """Check whether a scan result is queued for AI analysis"""
+        return self.ai_analyzer is not None and count_findings(result) > 0
+    
+    def _record_result(self, idx: int, result: Dict[str, Any]):
+        """Store a repository result in its slot and update the status tally"""
+        self.results[idx] = result
+        self._status_counts[result['status']] += 1
     
     def _save_individual_result(self, result: Dict[str, Any]):
         """Save individual repository scan result as readable text"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         repo_name = result.get('repo_name', 'unknown')
-        filename = f"{repo_name}_{timestamp}.txt"
+        # Same-named repositories (forks, mirrors) are told apart by a URL hash
+        url_key = RepositoryManager.url_key(result.get('repo_url', ''))[:8]
+        filename = f"{repo_name}_{url_key}_{self._run_timestamp}.txt"
         filepath = OUTPUT_DIR / filename
         
         try:
-            with open(filepath, 'w') as f:
-                self._write_text_report(f, result)
-            logger.info(f"Saved result to: {filepath}")
+            self._write_report_file(filepath, self._render_text_report(result))
+            logger.info("Saved result to: %s", filepath)
         except Exception as e:
-            logger.error(f"Failed to save result: {e}")
+            logger.error("Failed to save result: %s", e)
     
-    def _write_text_report(self, f, result: Dict[str, Any]):
-        """Write scan result in human-readable text format"""
-        f.write("=" * 80 + "\n")
-        f.write(f"SECURITY SCAN REPORT: {result.get('repo_name', 'Unknown')}\n")
-        f.write("=" * 80 + "\n\n")
-        
-        f.write(f"Repository URL: {result.get('repo_url', 'N/A')}\n")
-        f.write(f"Scan Time: {result.get('scan_time', 'N/A')}\n")
-        f.write(f"Status: {result.get('status', 'N/A').upper()}\n")
-        f.write("\n" + "-" * 80 + "\n\n")
-        
-        # Vulnerability Scan Results
-        vuln = result.get('vulnerability_scan', {})
-        if vuln:
-            f.write("VULNERABILITY SCAN RESULTS\n")
-            f.write("-" * 80 + "\n\n")
-            
-            # Python Dependencies
-            py_deps = vuln.get('python_dependencies', [])
-            if py_deps:
-                f.write(f"⚠️  PYTHON VULNERABILITIES ({len(py_deps)} found)\n\n")
-                for dep in py_deps:
-                    f.write(f"  • Package: {dep}\n")
-                f.write("\n")
-            else:
-                f.write("✓ No Python dependency vulnerabilities found\n\n")
-            
-            # Bandit Issues
-            bandit = vuln.get('bandit_issues', [])
-            if bandit:
-                f.write(f"⚠️  SECURITY CODE ISSUES ({len(bandit)} found)\n\n")
-                for issue in bandit:
-                    f.write(f"  • {issue}\n")
-                f.write("\n")
-            else:
-                f.write("✓ No security code issues found\n\n")
-            
-            # Common Issues
-            common = vuln.get('common_issues', [])
-            if common:
-                f.write(f"ℹ️  COMMON ISSUES ({len(common)} found)\n\n")
-                for issue in common:
-                    f.write(f"  • {issue}\n")
-                f.write("\n")
-            
-            f.write("-" * 80 + "\n\n")
-        
-        # Drupal Check Results
-        drupal = result.get('drupal_check', {})
-        if drupal and drupal.get('is_drupal'):
-            f.write("DRUPAL PROJECT ANALYSIS\n")
-            f.write("-" * 80 + "\n\n")
-            
-            f.write(f"Drupal Version: {drupal.get('drupal_version', 'Unknown')}\n")
-            f.write(f"Total Contrib Modules: {drupal.get('total_modules', 0)}\n\n")
-            
-            # All Modules
-            modules = drupal.get('modules', [])
-            if modules:
-                f.write("INSTALLED MODULES:\n\n")
-                for mod in modules:
-                    f.write(f"  📦 {mod.get('module', 'Unknown')}\n")
-                    f.write(f"     Current Version: {mod.get('current_version', 'N/A')}\n")
-                    f.write(f"     Latest Version: {mod.get('latest_version', 'N/A')}\n")
-                    if mod.get('repository_url'):
-                        f.write(f"     Repository: {mod.get('repository_url')}\n")
-                    f.write("\n")
-            
-            # Outdated Modules
-            outdated = drupal.get('outdated_modules', [])
-            if outdated:
-                f.write(f"\n⚠️  OUTDATED MODULES ({len(outdated)} need updates):\n\n")
-                for mod in outdated:
-                    f.write(f"  📦 {mod.get('module', 'Unknown')}\n")
-                    f.write(f"     Current: {mod.get('current_version', 'N/A')}\n")
-                    f.write(f"     Latest: {mod.get('latest_version', 'N/A')}\n")
-                    f.write(f"     Update Severity: {mod.get('severity', 'unknown').upper()}\n")
-                    if mod.get('repository_url'):
-                        f.write(f"     Repository: {mod.get('repository_url')}\n")
-                    f.write("\n")
-            else:
-                f.write("✓ All modules are up to date\n\n")
-            
-            f.write("-" * 80 + "\n\n")
-        
-        # AI Analysis
-        ai_analysis = result.get('ai_analysis')
-        if ai_analysis:
-            f.write("AI-POWERED SECURITY ANALYSIS\n")
-            f.write("-" * 80 + "\n\n")
-            f.write(ai_analysis)
-            f.write("\n\n")
-            f.write("-" * 80 + "\n\n")
-        
-        f.write("\nEnd of Report\n")
-        f.write("=" * 80 + "\n")
-
+    def _write_report_file(self, filepath: Path, report: str):
+        """Write a report to a temporary file, then atomically move it into place"""
+        tmp_path = filepath.with_suffix('.tmp')
+        try:
+            # Encode the whole report at once and skip the text-mode wrapper
+            with open(tmp_path, 'wb') as f:
+                f.write(report.encode('utf-8'))
+            os.replace(tmp_path, filepath)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    def _render_text_report(self, result: Dict[str, Any]) -> str:
+        """Render scan result in human-readable text format"""
+        return _REPORT_TEMPLATE.render(r=result)
     
     def _generate_report(self):
         """Generate summary report of all scans in text format"""
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        report_file = OUTPUT_DIR / f"summary_report_{timestamp}.txt"
+        report_file = OUTPUT_DIR / f"summary_report_{self._run_timestamp}.txt"
         
+        results = [r for r in self.results if r is not None]
         summary = {
             'scan_date': datetime.now().isoformat(),
-            'total_repositories': len(self.results),
-            'successful_scans': sum(1 for r in self.results if r.get('status') == 'completed'),
-            'failed_scans': sum(1 for r in self.results if r.get('status') != 'completed'),
-            'results': self.results
+            'total_repositories': len(results),
+            'successful_scans': self._status_counts['completed'],
+            'failed_scans': len(results) - self._status_counts['completed'],
+            'results': results
         }
         
         try:
-            with open(report_file, 'w') as f:
-                self._write_summary_report(f, summary)
+            self._write_report_file(report_file, self._render_summary(summary))
             logger.info(f"\nSummary report saved to: {report_file}")
             
             # Print summary to console
@@ -270,75 +457,30 @@ class ScannerAgent:
         except Exception as e:
             logger.error(f"Failed to generate report: {e}")
     
-    def _write_summary_report(self, f, summary: Dict[str, Any]):
-        """Write summary report in text format"""
-        f.write("=" * 80 + "\n")
-        f.write("SECURITY SCAN SUMMARY REPORT\n")
-        f.write("=" * 80 + "\n\n")
-        
-        f.write(f"Scan Date: {summary['scan_date']}\n")
-        f.write(f"Total Repositories: {summary['total_repositories']}\n")
-        f.write(f"Successful Scans: {summary['successful_scans']}\n")
-        f.write(f"Failed Scans: {summary['failed_scans']}\n")
-        f.write("\n" + "-" * 80 + "\n\n")
-        
-        for result in summary['results']:
-            repo_name = result.get('repo_name', 'Unknown')
-            status = result.get('status', 'unknown')
-            
-            f.write(f"\n📁 REPOSITORY: {repo_name}\n")
-            f.write(f"   URL: {result.get('repo_url', 'N/A')}\n")
-            f.write(f"   Status: {status.upper()}\n")
-            
-            if status == 'completed':
-                # Vulnerability summary
-                vuln = result.get('vulnerability_scan', {})
-                if vuln:
-                    py_vulns = len(vuln.get('python_dependencies', []))
-                    bandit_issues = len(vuln.get('bandit_issues', []))
-                    common_issues = len(vuln.get('common_issues', []))
-                    
-                    if py_vulns > 0:
-                        f.write(f"   ⚠️  Python Vulnerabilities: {py_vulns}\n")
-                    if bandit_issues > 0:
-                        f.write(f"   ⚠️  Security Code Issues: {bandit_issues}\n")
-                    if common_issues > 0:
-                        f.write(f"   ℹ️  Common Issues: {common_issues}\n")
-                
-                # Drupal summary
-                drupal = result.get('drupal_check', {})
-                if drupal and drupal.get('is_drupal'):
-                    total = drupal.get('total_modules', 0)
-                    outdated = len(drupal.get('outdated_modules', []))
-                    f.write(f"   🔷 Drupal Version: {drupal.get('drupal_version', 'Unknown')}\n")
-                    f.write(f"   📦 Total Modules: {total}\n")
-                    if outdated > 0:
-                        f.write(f"   ⚠️  Outdated Modules: {outdated}\n")
-            else:
-                error = result.get('error', 'Unknown error')
-                f.write(f"   ❌ Error: {error}\n")
-            
-            f.write("\n" + "-" * 80 + "\n")
-        
-        f.write("\n" + "=" * 80 + "\n")
-        f.write("End of Summary Report\n")
-        f.write("=" * 80 + "\n")
-
+    def _render_summary(self, summary: Dict[str, Any]) -> str:
+        """Render the summary report as a single string"""
+        return _SUMMARY_TEMPLATE.render(s=summary)
     
     def _print_summary(self, summary: Dict[str, Any]):
         """Print scan summary to console"""
-        print("\n" + "=" * 60)
-        print("SCAN SUMMARY")
-        print("=" * 60)
-        print(f"Total repositories scanned: {summary['total_repositories']}")
-        print(f"Successful scans: {summary['successful_scans']}")
-        print(f"Failed scans: {summary['failed_scans']}")
-        print()
+        # One write instead of a flushed print() per line
+        sys.stdout.write(self._render_console_summary(summary))
+    
+    def _render_console_summary(self, summary: Dict[str, Any]) -> str:
+        """Render the console scan summary as a single string"""
+        lines = []
+        lines.append("\n" + "=" * 60)
+        lines.append("SCAN SUMMARY")
+        lines.append("=" * 60)
+        lines.append(f"Total repositories scanned: {summary['total_repositories']}")
+        lines.append(f"Successful scans: {summary['successful_scans']}")
+        lines.append(f"Failed scans: {summary['failed_scans']}")
+        lines.append("")
         
         for result in summary['results']:
             if result.get('status') == 'completed':
-                print(f"\n📁 {result.get('repo_name', 'Unknown')}")
-                print("-" * 40)
+                lines.append(f"\n📁 {result.get('repo_name', 'Unknown')}")
+                lines.append("-" * 40)
                 
                 # Vulnerability summary
                 vuln = result.get('vulnerability_scan', {})
@@ -348,22 +490,37 @@ class ScannerAgent:
                     common_issues = len(vuln.get('common_issues', []))
                     
                     if py_vulns > 0:
-                        print(f"  ⚠️  Python vulnerabilities: {py_vulns}")
+                        lines.append(f"  ⚠️  Python vulnerabilities: {py_vulns}")
                     if bandit_issues > 0:
-                        print(f"  ⚠️  Bandit issues: {bandit_issues}")
+                        lines.append(f"  ⚠️  Bandit issues: {bandit_issues}")
                     if common_issues > 0:
-                        print(f"  ℹ️  Common issues: {common_issues}")
+                        lines.append(f"  ℹ️  Common issues: {common_issues}")
                 
                 # Drupal summary
                 drupal = result.get('drupal_check', {})
                 if drupal and drupal.get('is_drupal'):
                     outdated = len(drupal.get('outdated_modules', []))
                     total = drupal.get('total_modules', 0)
-                    print(f"  🔷 Drupal modules: {total}")
+                    lines.append(f"  🔷 Drupal modules: {total}")
                     if outdated > 0:
-                        print(f"  📦 Outdated modules: {outdated}")
+                        lines.append(f"  📦 Outdated modules: {outdated}")
         
-        print("\n" + "=" * 60)
+        lines.append("\n" + "=" * 60)
+        
+        return "\n".join(lines) + "\n"
+
+
+def _positive_int(value: str) -> int:
+    """argparse type for options that need a count of at least 1"""
+    import argparse
+    
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
 def main():
@@ -377,16 +534,29 @@ def main():
                        default='openai', help='AI provider to use')
     parser.add_argument('--ai-model', type=str, help='AI model to use (e.g., gpt-oss-20b)')
     parser.add_argument('--ai-base-url', type=str, help='Base URL for AI API (for local models)')
+    parser.add_argument('--max-concurrent', type=_positive_int, default=4,
+                       help='Maximum number of repositories processed at once')
+    parser.add_argument('--token-efficient-prompt', action='store_true',
+                       help='Trim AI prompts to ~512 input tokens (for quantized local models)')
+    parser.add_argument('--force-clone', action='store_true',
+                       help='Always clone fresh instead of reusing cached clones')
     
     args = parser.parse_args()
     
     # Create and run scanner
-    scanner = ScannerAgent(
-        use_ai=not args.no_ai,
-        ai_provider=args.ai_provider,
-        ai_model=args.ai_model,
-        ai_base_url=args.ai_base_url
-    )
+    try:
+        scanner = ScannerAgent(
+            use_ai=not args.no_ai,
+            ai_provider=args.ai_provider,
+            ai_model=args.ai_model,
+            ai_base_url=args.ai_base_url,
+            token_efficient_prompt=args.token_efficient_prompt,
+            max_concurrent=args.max_concurrent,
+            force_clone=args.force_clone
+        )
+    except ValueError as e:
+        # Invalid settings from the environment (e.g. AI_CONCURRENCY)
+        parser.error(str(e))
     scanner.run(cleanup=not args.no_cleanup)
 
 